@@ -10,24 +10,58 @@ Usage:
     python inference.py --audio path/to/audio.wav
     python inference.py --verify-model
     python inference.py --interactive
+    python inference.py --interactive --compile
+    python inference.py --use-daemon --text "Your message here"
+    python inference.py --kill-daemon
 """
 
+from __future__ import annotations
+
 import argparse
 import hashlib
 import json
+import mmap
 import os
+import queue
+import re
+import socket
+import socketserver
+import stat
+import subprocess
 import sys
+import tempfile
+import threading
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 
-import librosa
-import numpy as np
-import soundfile as sf
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
 import click
 
+# torch, transformers and librosa are imported inside the methods that need them so that
+# --help and --verify-model start without paying for the heavy imports
+if TYPE_CHECKING:
+    import numpy as np
+    import torch
+    from transformers import BitsAndBytesConfig
+
+# orjson is optional; it serializes several times faster than the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Shared decoder for pulling the first JSON object out of a model response
+JSON_DECODER = json.JSONDecoder()
+
+# Fields every suggestion must carry as strings
+REQUIRED_FIELDS = ("text", "confidence", "reasoning")
+REQUIRED_FIELD_SET = frozenset(REQUIRED_FIELDS)
+
+# File name of the Unix socket used by the resident inference daemon
+DAEMON_SOCKET_NAME = "clarity.sock"
+# Lock file, next to the socket, held by the daemon from startup until it exits
+DAEMON_LOCK_NAME = "clarity.lock"
+
 # Color constants for CLI output
 class Colors:
     HEADER = '\033[95m'
@@ -54,34 +88,145 @@ class Symbols:
     DASH = "─"
 
 
+def dumps_json(data: Dict[str, any]) -> str:
+    """Serialize a result for --json output."""
+    # Both branches emit the same two-space indented, non-ASCII-escaped layout
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(data, indent=2, ensure_ascii=False)
+
+
+def compute_sha256(path: Union[str, Path]) -> str:
+    """Compute a file's SHA256 without a Python-level read loop where possible."""
+    with open(path, "rb") as f:
+        if sys.version_info >= (3, 11):
+            # file_digest runs the read/hash loop in C with a tuned buffer size
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        
+        sha256_hash = hashlib.sha256()
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                sha256_hash.update(mm)
+        except (ValueError, OSError):
+            # Empty files and some filesystems can't be mapped; fall back to 1 MiB reads
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+class StopOnEvent:
+    """Stopping criteria (transformers StoppingCriteria protocol) that halts generation once an event is set."""
+    
+    def __init__(self, event: threading.Event):
+        self.event = event
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        import torch
+        
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class JsonObjectTracker:
+    """Track brace depth over streamed text to detect when the top-level JSON object closes."""
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+    
+    def feed(self, text: str) -> bool:
+        """Consume a chunk of text and return True once the object is complete."""
+        if self.complete:
+            return True
+        
+        # Braces inside string values don't count towards nesting
+        for ch in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.depth > 0:
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    break
+        
+        return self.complete
+
+
 class ClarityInference:
     """Gemma 3n-only inference engine for Clarity cognitive partner."""
     
-    def __init__(self, model_path: str = "models/gemma-3n-e2b-it-q4_k_m.gguf"):
+    # First number in a confidence value such as "85%" or "0.85"
+    _NUM_RE = re.compile(r"\d+(?:\.\d+)?")
+    
+    def __init__(self, model_path: str = "models/gemma-3n-e2b-it-q4_k_m.gguf", compile_model: bool = False,
+                 inference_dtype: str = "auto", quantization: str = "auto"):
         self.model_path = model_path
+        # Checked once here rather than re-stat'ing the file on every requirements/integrity check
+        self.model_exists = Path(model_path).exists()
+        # GGUF files run natively through llama.cpp; anything else loads via transformers
+        self.backend = "llama_cpp" if model_path.lower().endswith(".gguf") else "transformers"
+        self.compile_model = compile_model
+        self.inference_dtype = inference_dtype
+        self.quantization = quantization
         self.model = None
         self.tokenizer = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._device = None
+        
+        # Where print_status writes (None means stdout); --json points it at stderr to keep stdout parseable
+        self.status_file = None
+        # Message of the most recent error status, reported in the --json error result
+        self.last_error = None
         
         # Expected model checksum (update this when model changes)
         self.expected_sha256 = "a1b2c3d4e5f6..."  # Placeholder - update with actual hash
         
         # Model configuration
         self.max_length = 2048
+        self.max_new_tokens = 256
         self.temperature = 0.7
         self.top_p = 0.9
         
-        # Structured JSON output schema
+        # Structured JSON output schema, also used to constrain decoding
         self.json_schema = {
-            "suggestions": [
-                {
-                    "text": "<actionable suggestion>",
-                    "confidence": "<low|medium|high|number|percentage>",
-                    "reasoning": "<short explanation for this suggestion>"
+            "type": "object",
+            "properties": {
+                "suggestions": {
+                    "type": "array",
+                    "minItems": 1,
+                    "maxItems": 3,
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "text": {"type": "string"},
+                            "confidence": {"type": "string"},
+                            "reasoning": {"type": "string"}
+                        },
+                        "required": ["text", "confidence", "reasoning"]
+                    }
                 }
-            ]
+            },
+            "required": ["suggestions"]
         }
         
+        # Grammar / Outlines guide enforcing json_schema, set up by load_model when available
+        self.grammar = None
+        self.json_guide = None
+        self.guide_tokenizer = None
+        
+        # Token IDs for the fixed text around {user_input}, cached by load_model (transformers only)
+        self.prompt_prefix_ids = None
+        self.prompt_suffix_ids = None
+        
         # Prompt templates with strict JSON instruction
         self.chat_prompt_template = """<start_of_turn>user
 {user_input}
@@ -121,6 +266,17 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
 <start_of_turn>model
 """
     
+    @property
+    def device(self) -> str:
+        """Inference device, detected on first use so torch is only imported when needed."""
+        if self._device is None:
+            try:
+                import torch
+                self._device = "cuda" if torch.cuda.is_available() else "cpu"
+            except ImportError:
+                self._device = "cpu"
+        return self._device
+    
     def print_header(self):
         """Print Clarity header with branding."""
         print(f"{Colors.BOLD}{Colors.BLUE}")
@@ -148,7 +304,9 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
         
         color = colors.get(status, Colors.BLUE)
         symbol = symbols.get(status, Symbols.INFO)
-        print(f"{color}{symbol} {message}{Colors.ENDC}")
+        if status == "error":
+            self.last_error = message
+        print(f"{color}{symbol} {message}{Colors.ENDC}", file=self.status_file)
     
     def check_system_requirements(self) -> bool:
         """Check if system meets minimum requirements."""
@@ -161,7 +319,7 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
                 return False
             
             # Check if model file exists
-            if not os.path.exists(self.model_path):
+            if not self.model_exists:
                 self.print_status(f"Model not found: {self.model_path}", "error")
                 self.print_status("Please download the model using: python scripts/download_model.py", "info")
                 return False
@@ -172,49 +330,220 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
             self.print_status("psutil not available, skipping RAM check", "warning")
             return True
     
+    def get_torch_dtype(self) -> torch.dtype:
+        """Resolve the configured inference dtype, preferring bf16 where supported."""
+        import torch
+        
+        if self.inference_dtype == "bf16":
+            return torch.bfloat16
+        if self.inference_dtype == "fp16":
+            return torch.float16
+        if self.device == "cpu":
+            # Many CPU kernels lack fp16 support; bf16 keeps the halved memory footprint and works everywhere
+            return torch.bfloat16
+        if torch.cuda.is_bf16_supported():
+            return torch.bfloat16
+        return torch.float16
+    
+    def get_quantization_config(self) -> Optional[BitsAndBytesConfig]:
+        """Build a bitsandbytes weight-only quantization config, if enabled and available."""
+        if self.quantization == "none":
+            return None
+        
+        import torch
+        from transformers import BitsAndBytesConfig
+        
+        try:
+            import bitsandbytes  # noqa: F401
+        except ImportError:
+            if self.quantization != "auto":
+                self.print_status("bitsandbytes not available, loading unquantized weights", "warning")
+            return None
+        
+        if not torch.cuda.is_available():
+            if self.quantization != "auto":
+                self.print_status("Quantization requires a CUDA GPU, loading unquantized weights", "warning")
+            return None
+        
+        if self.quantization == "8bit":
+            return BitsAndBytesConfig(load_in_8bit=True)
+        
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=self.get_torch_dtype(),
+            bnb_4bit_quant_type="nf4"
+        )
+    
+    def get_attn_implementation(self) -> str:
+        """Pick a fused attention kernel: FlashAttention-2 when installed on CUDA, otherwise PyTorch SDPA."""
+        import torch
+        
+        if torch.cuda.is_available():
+            try:
+                import flash_attn  # noqa: F401
+                return "flash_attention_2"
+            except ImportError:
+                pass
+        return "sdpa"
+    
+    def ensure_model_loaded(self) -> bool:
+        """Check requirements and load the model unless it is already loaded."""
+        if self.model is not None:
+            return True
+        return self.check_system_requirements() and self.load_model()
+    
+    def load_llama_cpp_model(self) -> None:
+        """Load the GGUF model file with llama.cpp, offloading all layers to the GPU when available."""
+        from llama_cpp import Llama, LlamaGrammar
+        
+        self.model = Llama(
+            model_path=self.model_path,
+            n_ctx=self.max_length,
+            n_gpu_layers=-1,
+            logits_all=False,
+            verbose=False
+        )
+        
+        # Compile the schema to a GBNF grammar so every sampled token keeps the output valid JSON
+        self.grammar = LlamaGrammar.from_json_schema(json.dumps(self.json_schema), verbose=False)
+    
+    def compile_json_guide(self) -> None:
+        """Compile json_schema to an Outlines guide that constrains transformers output."""
+        try:
+            from outlines.fsm.guide import RegexGuide
+            from outlines.fsm.json_schema import build_regex_from_schema
+            from outlines.models.transformers import TransformerTokenizer
+        except ImportError:
+            self.print_status("outlines not available, JSON output will not be grammar-constrained", "warning")
+            return
+        
+        # The guide is stateless and expensive to build, so it is compiled once and shared
+        self.guide_tokenizer = TransformerTokenizer(self.tokenizer)
+        regex = build_regex_from_schema(json.dumps(self.json_schema))
+        self.json_guide = RegexGuide.from_regex(regex, self.guide_tokenizer)
+    
+    def get_json_logits_processor(self):
+        """Build a fresh logits processor over the compiled guide for a single generate() call."""
+        if self.json_guide is None:
+            return None
+        from outlines.processors import GuideLogitsProcessor
+        
+        # The processor records the prompt length and FSM state of the sequences it sees, so it can't be reused
+        return GuideLogitsProcessor(self.guide_tokenizer, self.json_guide)
+    
+    def load_transformers_model(self) -> None:
+        """Load the Hugging Face Gemma 3n model and tokenizer."""
+        import torch
+        from transformers import AutoTokenizer, AutoModelForCausalLM
+        
+        # Load tokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            "google/gemma-3n-2b-it",
+            trust_remote_code=True
+        )
+        # Left-pad batches so every prompt ends at the same position and generation starts aligned
+        self.tokenizer.padding_side = "left"
+        
+        # Load model
+        self.model = AutoModelForCausalLM.from_pretrained(
+            "google/gemma-3n-2b-it",
+            torch_dtype=self.get_torch_dtype(),
+            quantization_config=self.get_quantization_config(),
+            attn_implementation=self.get_attn_implementation(),
+            device_map="auto",
+            trust_remote_code=True
+        )
+        self.print_status(f"Attention implementation: {self.model.config._attn_implementation}", "info")
+        
+        # Static KV cache keeps the decode loop O(N) and its shapes fixed
+        self.model.generation_config.cache_implementation = "static"
+        
+        self.compile_json_guide()
+        self.prepare_prompt_ids()
+        
+        if self.compile_model:
+            self.print_status("Compiling model (one-time warmup)...", "info")
+            eager_forward = self.model.forward
+            try:
+                self.model.forward = torch.compile(eager_forward, mode="reduce-overhead", fullgraph=True)
+                # Compilation is lazy, so graph breaks and compile errors surface here
+                self.warmup()
+            except Exception as e:
+                self.model.forward = eager_forward
+                self.print_status(f"torch.compile failed, continuing in eager mode: {e}", "warning")
+    
     def load_model(self) -> bool:
         """Load the Gemma 3n model and tokenizer."""
         try:
             self.print_status("Loading Gemma 3n model...", "info")
             start_time = time.time()
             
-            # Load tokenizer
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                "google/gemma-3n-2b-it",
-                trust_remote_code=True
-            )
+            if self.backend == "llama_cpp":
+                try:
+                    self.load_llama_cpp_model()
+                except ImportError:
+                    self.print_status("llama-cpp-python not available, falling back to transformers", "warning")
+                    self.backend = "transformers"
             
-            # Load model
-            self.model = AutoModelForCausalLM.from_pretrained(
-                "google/gemma-3n-2b-it",
-                torch_dtype=torch.float16,
-                device_map="auto",
-                trust_remote_code=True
-            )
+            if self.backend == "transformers":
+                self.load_transformers_model()
             
             load_time = time.time() - start_time
-            self.print_status(f"Model loaded in {load_time:.1f} seconds", "success")
+            self.print_status(f"Model loaded in {load_time:.1f} seconds ({self.backend})", "success")
             return True
             
         except Exception as e:
             self.print_status(f"Error loading model: {e}", "error")
             return False
     
+    def prepare_prompt_ids(self) -> None:
+        """Tokenize the fixed parts of the chat template once so only user text is tokenized per call."""
+        prefix, suffix = self.chat_prompt_template.split("{user_input}")
+        # format() with no arguments unescapes the literal {{ }} braces in the JSON example
+        self.prompt_prefix_ids = self.tokenizer(prefix.format(), return_tensors="pt").input_ids.to(self.device)
+        self.prompt_suffix_ids = self.tokenizer(
+            suffix.format(), add_special_tokens=False, return_tensors="pt"
+        ).input_ids.to(self.device)
+    
+    def tokenize(self, text: Union[str, List[str]], **kwargs) -> Dict[str, torch.Tensor]:
+        """Tokenize text on the CPU and transfer the resulting tensors to the model device."""
+        encoded = self.tokenizer(text, return_tensors="pt", **kwargs)
+        # Inputs are a few hundred token IDs, so a plain synchronous copy beats allocating pinned memory per call
+        return {name: tensor.to(self.device) for name, tensor in encoded.items()}
+    
+    def encode_chat_prompt(self, text: str) -> Dict[str, torch.Tensor]:
+        """Build chat prompt inputs from the cached template token IDs and the tokenized user text."""
+        import torch
+        
+        user_ids = self.tokenize(text, add_special_tokens=False)["input_ids"]
+        input_ids = torch.cat([self.prompt_prefix_ids, user_ids, self.prompt_suffix_ids], dim=1)
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+    
+    def warmup(self) -> None:
+        """Run a short dummy generation so compilation happens before user requests."""
+        import torch
+        
+        inputs = self.tokenize("Hello")
+        with torch.no_grad():
+            self.model.generate(
+                **inputs,
+                max_new_tokens=8,
+                do_sample=False,
+                use_cache=True,
+                cache_implementation="static",
+                pad_token_id=self.tokenizer.eos_token_id
+            )
+    
     def verify_model_integrity(self) -> bool:
         """Verify model file integrity using SHA256 checksum."""
         try:
-            if not os.path.exists(self.model_path):
+            if not self.model_exists:
                 self.print_status(f"Model file not found: {self.model_path}", "error")
                 return False
             
             self.print_status("Verifying model integrity...", "info")
             
-            sha256_hash = hashlib.sha256()
-            with open(self.model_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
-            
-            actual_hash = sha256_hash.hexdigest()
+            actual_hash = compute_sha256(self.model_path)
             
             if self.expected_sha256 == "a1b2c3d4e5f6...":  # Placeholder
                 self.print_status(f"Model SHA256: {actual_hash}", "info")
@@ -225,8 +554,8 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
                 return True
             else:
                 self.print_status("Model integrity check failed", "error")
-                print(f"Expected: {self.expected_sha256}")
-                print(f"Actual:   {actual_hash}")
+                print(f"Expected: {self.expected_sha256}", file=self.status_file)
+                print(f"Actual:   {actual_hash}", file=self.status_file)
                 return False
                 
         except Exception as e:
@@ -235,18 +564,19 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
     
     def preprocess_audio(self, audio_path: str) -> np.ndarray:
         """Preprocess audio file for STT processing."""
+        import librosa
+        import numpy as np
+        
         try:
             self.print_status(f"Processing audio: {audio_path}", "info")
             
-            # Load audio and resample to 16kHz
-            audio, sr = librosa.load(audio_path, sr=16000)
+            # Load mono audio and resample to 16kHz with libsoxr's vectorized polyphase filter
+            audio, sr = librosa.load(audio_path, sr=16000, mono=True, res_type="soxr_hq")
             
-            # Normalize audio
-            audio = librosa.util.normalize(audio)
-            
-            # Ensure mono channel
-            if len(audio.shape) > 1:
-                audio = np.mean(audio, axis=1)
+            # Peak-normalize audio in place to avoid another full-buffer allocation
+            peak = np.abs(audio).max() if audio.size else 0.0
+            if peak > 0:
+                np.multiply(audio, 1.0 / peak, out=audio)
             
             self.print_status(f"Audio processed: {len(audio)/sr:.1f}s at {sr}Hz", "success")
             return audio
@@ -263,13 +593,11 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
             
             # Try to find JSON object in the response
             start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
+            if start_idx < 0:
                 raise ValueError("No JSON object found in response")
             
-            json_str = response[start_idx:end_idx]
-            parsed = json.loads(json_str)
+            # Decode straight from the opening brace, ignoring any trailing text
+            parsed, _end = JSON_DECODER.raw_decode(response, start_idx)
             
             # Validate schema
             if "suggestions" not in parsed:
@@ -287,13 +615,14 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
                 if not isinstance(suggestion, dict):
                     raise ValueError(f"Suggestion {i} must be an object")
                 
-                required_fields = ["text", "confidence", "reasoning"]
-                for field in required_fields:
-                    if field not in suggestion:
-                        raise ValueError(f"Suggestion {i} missing required field: {field}")
-                    
-                    if not isinstance(suggestion[field], str):
-                        raise ValueError(f"Suggestion {i}.{field} must be a string")
+                missing = REQUIRED_FIELD_SET - suggestion.keys()
+                if missing:
+                    fields = ", ".join(field for field in REQUIRED_FIELDS if field in missing)
+                    raise ValueError(f"Suggestion {i} missing required field: {fields}")
+                
+                if not all(isinstance(suggestion[field], str) for field in REQUIRED_FIELDS):
+                    field = next(field for field in REQUIRED_FIELDS if not isinstance(suggestion[field], str))
+                    raise ValueError(f"Suggestion {i}.{field} must be a string")
             
             return parsed
             
@@ -302,61 +631,191 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
         except Exception as e:
             raise ValueError(f"Error parsing response: {e}")
     
-    def generate_structured_response(self, prompt: str, is_stt: bool = False) -> Dict[str, any]:
+    def stream_generate(self, generation_kwargs: Dict[str, any], echo: bool = False) -> str:
+        """Generate tokens incrementally, stopping as soon as the JSON object is complete."""
+        import torch
+        from transformers import StoppingCriteriaList, TextIteratorStreamer
+        
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        json_complete = threading.Event()
+        errors: List[Exception] = []
+        
+        def run_generate():
+            try:
+                with torch.no_grad():
+                    self.model.generate(
+                        **generation_kwargs,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([StopOnEvent(json_complete)])
+                    )
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+        
+        thread = threading.Thread(target=run_generate, daemon=True)
+        thread.start()
+        
+        chunks = []
+        tracker = JsonObjectTracker()
+        for chunk in streamer:
+            chunks.append(chunk)
+            if echo:
+                print(chunk, end="", flush=True)
+            if tracker.feed(chunk):
+                json_complete.set()
+        
+        thread.join()
+        if echo:
+            print()
+        if errors:
+            raise errors[0]
+        
+        return "".join(chunks).strip()
+    
+    def llama_cpp_generate(self, prompt: str, stream: bool = False) -> str:
+        """Generate a reply with llama.cpp, optionally echoing tokens and stopping once the JSON closes."""
+        completion_kwargs = dict(
+            max_tokens=self.max_new_tokens,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            stop=["<end_of_turn>"],
+            grammar=self.grammar
+        )
+        
+        if not stream:
+            completion = self.model(prompt, **completion_kwargs)
+            return completion["choices"][0]["text"].strip()
+        
+        chunks = []
+        tracker = JsonObjectTracker()
+        for part in self.model(prompt, stream=True, **completion_kwargs):
+            chunk = part["choices"][0]["text"]
+            chunks.append(chunk)
+            print(chunk, end="", flush=True)
+            # Leaving the generator early stops llama.cpp from decoding further tokens
+            if tracker.feed(chunk):
+                break
+        print()
+        
+        return "".join(chunks).strip()
+    
+    def get_generation_kwargs(self) -> Dict[str, any]:
+        """Sampling, cache and grammar settings for one generate() call."""
+        generation_kwargs = dict(
+            max_new_tokens=self.max_new_tokens,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            do_sample=True,
+            use_cache=True,
+            cache_implementation="static",
+            pad_token_id=self.tokenizer.eos_token_id
+        )
+        logits_processor = self.get_json_logits_processor()
+        if logits_processor is not None:
+            from transformers import LogitsProcessorList
+            generation_kwargs["logits_processor"] = LogitsProcessorList([logits_processor])
+        return generation_kwargs
+    
+    def decode_response(self, output_ids: torch.Tensor, prompt_len: int) -> str:
+        """Decode only the tokens generated after the prompt and return the model's reply."""
+        return self.tokenizer.decode(output_ids[prompt_len:], skip_special_tokens=True).strip()
+    
+    def success_result(self, parsed_response: Dict[str, any]) -> Dict[str, any]:
+        """Wrap a validated response in the structured success envelope."""
+        return {
+            "success": True,
+            "data": parsed_response,
+            "model": "gemma-3n-e2b-it",
+            "processing_time": time.time()
+        }
+    
+    def error_result(self, error: Exception) -> Dict[str, any]:
+        """Build the structured error response with fallback suggestions."""
+        return {
+            "success": False,
+            "error": str(error),
+            "fallback_suggestions": [
+                {
+                    "text": "I'm having trouble processing your request right now. Please try again.",
+                    "confidence": "low",
+                    "reasoning": "Technical error occurred during processing"
+                }
+            ],
+            "model": "gemma-3n-e2b-it"
+        }
+    
+    def generate_structured_response(self, prompt: str, is_stt: bool = False, stream: bool = False,
+                                     inputs: Optional[Dict[str, torch.Tensor]] = None) -> Dict[str, any]:
         """Generate structured JSON response using Gemma 3n model."""
         try:
-            if self.model is None or self.tokenizer is None:
+            if self.model is None:
                 raise ValueError("Model not loaded")
             
-            # Tokenize input
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+            if self.backend == "llama_cpp":
+                model_response = self.llama_cpp_generate(prompt, stream=stream)
+                return self.success_result(self.parse_json_response(model_response))
             
-            # Generate response
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_length=self.max_length,
-                    temperature=self.temperature,
-                    top_p=self.top_p,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id
-                )
+            import torch
             
-            # Decode response
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            # Tokenize input unless the caller already encoded it
+            if inputs is None:
+                inputs = self.tokenize(prompt)
+            generation_kwargs = dict(**inputs, **self.get_generation_kwargs())
             
-            # Extract only the model's response (after the prompt)
-            model_response = response.split("<start_of_turn>model")[-1].strip()
+            if stream:
+                # Streamer only yields new tokens, so no prompt stripping is needed
+                model_response = self.stream_generate(generation_kwargs, echo=True)
+            else:
+                # Generate response
+                with torch.no_grad():
+                    outputs = self.model.generate(**generation_kwargs)
+                
+                model_response = self.decode_response(outputs[0], inputs["input_ids"].shape[1])
             
             # Parse and validate JSON
             parsed_response = self.parse_json_response(model_response)
-            
-            return {
-                "success": True,
-                "data": parsed_response,
-                "model": "gemma-3n-e2b-it",
-                "processing_time": time.time()
-            }
+            return self.success_result(parsed_response)
             
         except Exception as e:
             # Return structured error response
-            return {
-                "success": False,
-                "error": str(e),
-                "fallback_suggestions": [
-                    {
-                        "text": "I'm having trouble processing your request right now. Please try again.",
-                        "confidence": "low",
-                        "reasoning": "Technical error occurred during processing"
-                    }
-                ],
-                "model": "gemma-3n-e2b-it"
-            }
+            return self.error_result(e)
+    
+    def generate_batch(self, prompts: List[str]) -> List[Dict[str, any]]:
+        """Generate structured responses for several prompts in a single batched generate() call."""
+        if self.backend == "llama_cpp":
+            # llama-cpp-python exposes no batched completion API, so run the prompts back to back
+            return [self.generate_structured_response(prompt) for prompt in prompts]
+        
+        import torch
+        
+        try:
+            if self.model is None:
+                raise ValueError("Model not loaded")
+            
+            inputs = self.tokenize(prompts, padding=True)
+            
+            with torch.no_grad():
+                outputs = self.model.generate(**inputs, **self.get_generation_kwargs())
+                
+        except Exception as e:
+            return [self.error_result(e) for _ in prompts]
+        
+        # Prompts are left-padded to a common length, so generated tokens start at the same index in every row
+        prompt_len = inputs["input_ids"].shape[1]
+        results = []
+        for output_ids in outputs:
+            try:
+                parsed_response = self.parse_json_response(self.decode_response(output_ids, prompt_len))
+                results.append(self.success_result(parsed_response))
+            except Exception as e:
+                results.append(self.error_result(e))
+        return results
     
-    def process_text(self, text: str) -> Dict[str, any]:
+    def process_text(self, text: str, stream: bool = False) -> Dict[str, any]:
         """Process text input for chat mode with structured output."""
         prompt = self.chat_prompt_template.format(user_input=text)
-        return self.generate_structured_response(prompt, is_stt=False)
+        inputs = self.encode_chat_prompt(text) if self.prompt_prefix_ids is not None else None
+        return self.generate_structured_response(prompt, is_stt=False, stream=stream, inputs=inputs)
     
     def process_audio(self, audio_path: str) -> Dict[str, any]:
         """Process audio input for STT mode with structured output."""
@@ -373,9 +832,16 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
     
     def get_confidence_color(self, confidence: str) -> str:
         """Get color for confidence level."""
-        if "high" in confidence.lower() or any(c.isdigit() and int(c) > 70 for c in confidence if c.isdigit()):
+        match = self._NUM_RE.search(confidence)
+        score = float(match.group()) if match else -1.0
+        # Treat decimal fractions such as "0.85" as percentages; integers like "1" are already on a 0-100 scale
+        if match and "." in match.group() and score <= 1 and "%" not in confidence:
+            score *= 100
+        
+        level = confidence.lower()
+        if "high" in level or score > 70:
             return Colors.GREEN
-        elif "medium" in confidence.lower() or any(c.isdigit() and 40 <= int(c) <= 70 for c in confidence if c.isdigit()):
+        elif "medium" in level or 40 <= score <= 70:
             return Colors.YELLOW
         else:
             return Colors.RED
@@ -419,12 +885,8 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
     
     def run_inference(self, text: Optional[str] = None, audio: Optional[str] = None) -> None:
         """Main inference method with structured output."""
-        # Check system requirements
-        if not self.check_system_requirements():
-            sys.exit(1)
-        
-        # Load model
-        if not self.load_model():
+        # Check system requirements and load model
+        if not self.ensure_model_loaded():
             sys.exit(1)
         
         # Process input
@@ -448,13 +910,14 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
         print()
         
         # Check if model is ready
-        if not self.check_system_requirements():
-            self.print_status("Model not ready. Please run setup first.", "error")
-            return
-        
-        if not self.load_model():
-            self.print_status("Failed to load model. Please check installation.", "error")
-            return
+        if self.model is None:
+            if not self.check_system_requirements():
+                self.print_status("Model not ready. Please run setup first.", "error")
+                return
+            
+            if not self.load_model():
+                self.print_status("Failed to load model. Please check installation.", "error")
+                return
         
         while True:
             try:
@@ -469,7 +932,7 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
                     continue
                 
                 print(f"{Colors.BOLD}{Colors.GREEN}🤖 Clarity:{Colors.ENDC}")
-                result = self.process_text(user_input)
+                result = self.process_text(user_input, stream=True)
                 self.display_structured_output(result)
                 print()
                 
@@ -480,6 +943,230 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
                 self.print_status(f"Error: {e}", "error")
 
 
+class RequestBatcher:
+    """Collect concurrent text requests and run them through the model as one batch."""
+    
+    def __init__(self, engine: ClarityInference, max_batch_size: int = 8, max_wait: float = 0.05,
+                 timeout: float = 600.0):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Upper bound on how long a client waits for its batch before giving up
+        self.timeout = timeout
+        self.pending = queue.Queue()
+        # Serializes model access between batched generation and unbatched work (audio)
+        self.model_lock = threading.Lock()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+    
+    def submit(self, text: str) -> Dict[str, any]:
+        """Queue a text request and block until its batch has been generated."""
+        request = {
+            "prompt": self.engine.chat_prompt_template.format(user_input=text),
+            "done": threading.Event()
+        }
+        self.pending.put(request)
+        if not request["done"].wait(self.timeout):
+            return self.engine.error_result(TimeoutError(f"No result after {self.timeout:.0f} seconds"))
+        return request["result"]
+    
+    def run(self) -> None:
+        """Worker loop: wait briefly for more requests to arrive, then generate them together."""
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Every request must get a result, or its client would wait out the full timeout
+            try:
+                with self.model_lock:
+                    results = self.engine.generate_batch([request["prompt"] for request in batch])
+            except Exception as e:
+                results = [self.engine.error_result(e) for _ in batch]
+            
+            for request, result in zip(batch, results):
+                request["result"] = result
+                request["done"].set()
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """Handle a single newline-delimited JSON request against the resident engine."""
+    
+    def handle(self):
+        engine = self.server.engine
+        batcher = self.server.batcher
+        line = self.rfile.readline()
+        if not line:
+            # Liveness probe from daemon_is_running(); nothing to answer
+            return
+        
+        try:
+            request = json.loads(line)
+            action = request.get("action")
+            config = request.get("config")
+            
+            if action in ("text", "audio") and config is not None and config != self.server.config:
+                result = {
+                    "success": False,
+                    "error": f"Daemon is running with {self.server.config}, not {config}; "
+                             "stop it with --kill-daemon first"
+                }
+            elif action == "text":
+                result = batcher.submit(request["input"])
+            elif action == "audio":
+                with batcher.model_lock:
+                    result = engine.process_audio(request["input"])
+            elif action == "shutdown":
+                result = {"success": True}
+                # shutdown() blocks until serve_forever returns, so it can't run on this thread
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                result = {"success": False, "error": f"Unknown action: {action}"}
+                
+        except Exception as e:
+            result = {"success": False, "error": f"Invalid daemon request: {e}"}
+        
+        self.wfile.write((json.dumps(result) + "\n").encode("utf-8"))
+
+
+def get_daemon_socket_path() -> str:
+    """Return the daemon socket path inside a private per-user directory, creating it if needed."""
+    # Prefer the per-user runtime dir; a shared temp dir lets other users squat on a predictable name
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        socket_dir = os.path.join(runtime_dir, "clarity")
+    else:
+        socket_dir = os.path.join(tempfile.gettempdir(), f"clarity-{os.getuid()}")
+    
+    try:
+        os.mkdir(socket_dir, 0o700)
+    except FileExistsError:
+        pass
+    
+    # lstat so a symlink planted in place of the directory is rejected rather than followed
+    info = os.lstat(socket_dir)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"Daemon directory {socket_dir} is not a private directory owned by the current user")
+    return os.path.join(socket_dir, DAEMON_SOCKET_NAME)
+
+
+def daemon_config(engine: ClarityInference) -> Dict[str, str]:
+    """Settings a daemon must have been started with to serve this engine's requests."""
+    return {
+        "model_path": os.path.abspath(engine.model_path),
+        "inference_dtype": engine.inference_dtype,
+        "quantization": engine.quantization
+    }
+
+
+def acquire_daemon_lock(socket_path: str) -> Optional[int]:
+    """Take the daemon lock without blocking, returning its file descriptor or None if another process holds it."""
+    import fcntl
+    
+    lock_fd = os.open(os.path.join(os.path.dirname(socket_path), DAEMON_LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(lock_fd)
+        return None
+    return lock_fd
+
+
+def daemon_is_starting(socket_path: str) -> bool:
+    """Check whether another process holds the daemon lock, i.e. a daemon is loading or serving."""
+    lock_fd = acquire_daemon_lock(socket_path)
+    if lock_fd is None:
+        return True
+    os.close(lock_fd)
+    return False
+
+
+def socket_is_trusted(socket_path: str) -> bool:
+    """Check that the path is a socket owned by the current user."""
+    try:
+        info = os.lstat(socket_path)
+    except FileNotFoundError:
+        return False
+    return stat.S_ISSOCK(info.st_mode) and info.st_uid == os.getuid()
+
+
+def daemon_is_running(socket_path: str) -> bool:
+    """Check whether a daemon is accepting connections on the socket."""
+    if not socket_is_trusted(socket_path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+
+def daemon_request(payload: Dict[str, any], socket_path: str) -> Dict[str, any]:
+    """Send a JSON request to the daemon and return its JSON reply."""
+    if not socket_is_trusted(socket_path):
+        raise ConnectionError(f"{socket_path} is not a daemon socket owned by the current user")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as reply:
+            return json.loads(reply.readline())
+
+
+def run_daemon(engine: ClarityInference, socket_path: str) -> None:
+    """Serve requests with an already-loaded engine until a shutdown request arrives."""
+    # Never take over a live daemon's socket; it would keep running but become unreachable
+    if daemon_is_running(socket_path):
+        raise RuntimeError(f"Another daemon is already serving {socket_path}")
+    
+    # Remove a stale socket left behind by a daemon that didn't exit cleanly
+    if socket_is_trusted(socket_path):
+        os.unlink(socket_path)
+    elif os.path.lexists(socket_path):
+        raise RuntimeError(f"{socket_path} exists and is not a daemon socket owned by the current user")
+    
+    # One thread per connection so concurrent clients can be batched together
+    server = socketserver.ThreadingUnixStreamServer(socket_path, DaemonRequestHandler)
+    server.daemon_threads = True
+    server.config = daemon_config(engine)
+    server.engine = engine
+    server.batcher = RequestBatcher(engine)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_is_trusted(socket_path):
+            os.unlink(socket_path)
+
+
+def spawn_daemon(args: List[str], socket_path: str, timeout: float = 300.0) -> bool:
+    """Start a detached daemon process and wait until it accepts connections."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--daemon", *args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if daemon_is_running(socket_path):
+            return True
+        # A concurrent caller's daemon may have won the lock, in which case ours exits and we wait for theirs
+        if process.poll() is not None and not daemon_is_starting(socket_path):
+            return False
+        time.sleep(0.5)
+    return False
+
+
 @click.command()
 @click.option('--text', '-t', help='Text input for chat mode')
 @click.option('--audio', '-a', help='Audio file path for STT mode')
@@ -487,23 +1174,76 @@ Do not include any other text, markdown, or formatting. Only valid JSON.
 @click.option('--interactive', '-i', is_flag=True, help='Start interactive mode')
 @click.option('--model-path', default='models/gemma-3n-e2b-it-q4_k_m.gguf', 
               help='Path to the Gemma 3n model file')
-@click.option('--json', is_flag=True, help='Output raw JSON only (for scripting)')
-def main(text: Optional[str], audio: Optional[str], verify_model: bool, interactive: bool, model_path: str, json: bool):
+@click.option('--json', 'output_json', is_flag=True, help='Output raw JSON only (for scripting)')
+@click.option('--compile', 'compile_model', is_flag=True,
+              help='Compile the model with torch.compile (slower startup, faster generation)')
+@click.option('--inference-dtype', type=click.Choice(['auto', 'bf16', 'fp16']), default='auto',
+              help='Model weight dtype (auto uses bf16 when the GPU supports it)')
+@click.option('--quantize', 'quantization', type=click.Choice(['auto', '4bit', '8bit', 'none']), default='auto',
+              help='Weight-only quantization via bitsandbytes (auto uses 4bit when a CUDA GPU is available)')
+@click.option('--daemon', is_flag=True, help='Keep the model resident and serve requests over a local socket')
+@click.option('--use-daemon', is_flag=True, help='Send the request to the resident daemon, starting it if needed')
+@click.option('--kill-daemon', is_flag=True, help='Stop the resident daemon')
+def main(text: Optional[str], audio: Optional[str], verify_model: bool, interactive: bool, model_path: str, output_json: bool,
+         compile_model: bool, inference_dtype: str, quantization: str, daemon: bool, use_daemon: bool,
+         kill_daemon: bool):
     """Clarity: Gemma 3n-Only Cognitive Partner with Structured Reasoning"""
     
     # Initialize inference engine
-    engine = ClarityInference(model_path)
+    engine = ClarityInference(model_path, compile_model=compile_model, inference_dtype=inference_dtype,
+                              quantization=quantization)
     
-    if not json:
+    if output_json:
+        # Keep stdout for the JSON result; loading and progress messages go to stderr
+        engine.status_file = sys.stderr
+    else:
         engine.print_header()
     
+    if (daemon or use_daemon or kill_daemon) and not hasattr(socket, "AF_UNIX"):
+        if not output_json:
+            engine.print_status("Daemon mode requires Unix domain sockets, which this platform lacks", "error")
+        sys.exit(1)
+    
+    if daemon or use_daemon or kill_daemon:
+        try:
+            socket_path = get_daemon_socket_path()
+        except (OSError, RuntimeError) as e:
+            if not output_json:
+                engine.print_status(f"Cannot set up daemon socket: {e}", "error")
+            sys.exit(1)
+    
+    if kill_daemon:
+        if daemon_is_running(socket_path):
+            daemon_request({"action": "shutdown"}, socket_path)
+            if not output_json:
+                engine.print_status("Daemon stopped", "success")
+        elif not output_json:
+            engine.print_status("No daemon is running", "warning")
+        sys.exit(0)
+    
+    if daemon:
+        # Held until this process exits, so concurrent starts load the model and bind the socket only once
+        lock_fd = acquire_daemon_lock(socket_path)
+        if lock_fd is None or daemon_is_running(socket_path):
+            engine.print_status("Daemon is already running", "warning")
+            sys.exit(0)
+        if not engine.ensure_model_loaded():
+            sys.exit(1)
+        engine.print_status(f"Daemon listening on {socket_path}", "success")
+        try:
+            run_daemon(engine, socket_path)
+        except RuntimeError as e:
+            engine.print_status(str(e), "error")
+            sys.exit(1)
+        return
+    
     if verify_model:
         if engine.verify_model_integrity():
-            if not json:
+            if not output_json:
                 engine.print_status("Model verification completed successfully", "success")
             sys.exit(0)
         else:
-            if not json:
+            if not output_json:
                 engine.print_status("Model verification failed", "error")
             sys.exit(1)
     
@@ -513,7 +1253,7 @@ def main(text: Optional[str], audio: Optional[str], verify_model: bool, interact
     
     # Validate input
     if not text and not audio:
-        if not json:
+        if not output_json:
             engine.print_status("Please provide either --text, --audio, or --interactive", "error")
             print("Examples:")
             print("  python inference.py --text 'Hello, how are you?'")
@@ -522,29 +1262,57 @@ def main(text: Optional[str], audio: Optional[str], verify_model: bool, interact
         sys.exit(1)
     
     if text and audio:
-        if not json:
+        if not output_json:
             engine.print_status("Please provide only one input type (--text OR --audio)", "error")
         sys.exit(1)
     
+    # Load the model once up front; the daemon path keeps it resident in another process instead
+    if not use_daemon and not engine.ensure_model_loaded():
+        if output_json:
+            print(dumps_json(engine.error_result(RuntimeError(engine.last_error or "Model could not be loaded"))))
+        sys.exit(1)
+    
     # Run inference
     try:
-        if text:
+        if use_daemon:
+            if not daemon_is_running(socket_path):
+                if not output_json:
+                    engine.print_status("Starting Clarity daemon (first request loads the model)...", "info")
+                daemon_args = ["--model-path", model_path, "--inference-dtype", inference_dtype,
+                               "--quantize", quantization]
+                if compile_model:
+                    daemon_args.append("--compile")
+                if not spawn_daemon(daemon_args, socket_path):
+                    if not output_json:
+                        engine.print_status("Failed to start daemon. Try running with --daemon to see errors.", "error")
+                    sys.exit(1)
+            
+            # The daemon rejects the request if it was started with a different model or settings
+            if text:
+                request = {"action": "text", "input": text}
+            else:
+                request = {"action": "audio", "input": os.path.abspath(audio)}
+            request["config"] = daemon_config(engine)
+            result = daemon_request(request, socket_path)
+        elif text:
             result = engine.process_text(text)
         elif audio:
             result = engine.process_audio(audio)
         
-        if json:
+        if output_json:
             # Output raw JSON for scripting
-            print(json.dumps(result, indent=2))
+            print(dumps_json(result))
         else:
             engine.display_structured_output(result)
             
     except KeyboardInterrupt:
-        if not json:
+        if not output_json:
             print(f"\n{Colors.YELLOW}Interrupted by user{Colors.ENDC}")
         sys.exit(0)
     except Exception as e:
-        if not json:
+        if output_json:
+            print(dumps_json(engine.error_result(e)))
+        else:
             engine.print_status(f"Error: {e}", "error")
         sys.exit(1)
 
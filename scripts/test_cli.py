@@ -6,9 +6,31 @@ This tests the CLI interface without requiring model dependencies.
 
 import sys
 from pathlib import Path
+from typing import List, Optional
+
+# Add the repository root to the path, once
+_ROOT = str(Path(__file__).resolve().parent.parent)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
+
+# Banner and separators, built once at import instead of on every call
+_HEADER = (
+    "╔══════════════════════════════════════════════════════════════╗\n"
+    "║                    🧠 CLARITY CLI                           ║\n"
+    "║              Privacy-First Cognitive Partner                ║\n"
+    "║                    Gemma 3n-Only                            ║\n"
+    "╚══════════════════════════════════════════════════════════════╝\n"
+)
+_SEP60 = "=" * 60
+_SEP40 = "-" * 40
+
+# Status symbols, looked up by attribute name from print_status
+class _S:
+    info = "ℹ️"
+    success = "✅"
+    warning = "⚠️"
+    error = "❌"
 
-# Add parent directory to path
-sys.path.append(str(Path(__file__).parent.parent))
 
 # Mock the inference module for testing
 class MockClarityInference:
@@ -17,96 +39,97 @@ class MockClarityInference:
     def __init__(self):
         self.model_path = "models/test-model.gguf"
     
-    def print_header(self):
+    def emit(self, line: str, buf: Optional[List[str]] = None):
+        """Print a line, or append it to buf so the caller can write everything at once."""
+        if buf is None:
+            print(line)
+        else:
+            buf.append(line)
+    
+    def print_header(self, buf: Optional[List[str]] = None):
         """Print Clarity header with branding."""
-        print("╔══════════════════════════════════════════════════════════════╗")
-        print("║                    🧠 CLARITY CLI                           ║")
-        print("║              Privacy-First Cognitive Partner                ║")
-        print("║                    Gemma 3n-Only                            ║")
-        print("╚══════════════════════════════════════════════════════════════╝")
+        if buf is None:
+            sys.stdout.write(_HEADER)
+        else:
+            buf.append(_HEADER[:-1])
     
-    def print_status(self, message: str, status: str = "info"):
+    def print_status(self, message: str, status: str = "info", buf: Optional[List[str]] = None):
         """Print formatted status message."""
-        symbols = {
-            "info": "ℹ️",
-            "success": "✅",
-            "warning": "⚠️",
-            "error": "❌"
-        }
-        symbol = symbols.get(status, "ℹ️")
-        print(f"{symbol} {message}")
+        self.emit(f"{getattr(_S, status, _S.info)} {message}", buf)
     
-    def check_system_requirements(self) -> bool:
+    def check_system_requirements(self, buf: Optional[List[str]] = None) -> bool:
         """Mock system requirements check."""
-        self.print_status("Checking system requirements...", "info")
-        self.print_status("System requirements met", "success")
+        self.print_status("Checking system requirements...", "info", buf)
+        self.print_status("System requirements met", "success", buf)
         return True
     
-    def verify_model_integrity(self) -> bool:
+    def verify_model_integrity(self, buf: Optional[List[str]] = None) -> bool:
         """Mock model verification."""
-        self.print_status("Verifying model integrity...", "info")
-        self.print_status("Model verification completed successfully", "success")
+        self.print_status("Verifying model integrity...", "info", buf)
+        self.print_status("Model verification completed successfully", "success", buf)
         return True
     
-    def display_structured_output(self, result: dict):
+    def display_structured_output(self, result: dict, buf: Optional[List[str]] = None):
         """Display structured output with confidence and reasoning."""
-        print("\n" + "="*60)
-        print("🤖 CLARITY RESPONSE")
-        print("="*60)
+        self.emit(f"\n{_SEP60}", buf)
+        self.emit("🤖 CLARITY RESPONSE", buf)
+        self.emit(_SEP60, buf)
         
         if result.get("success", False):
             suggestions = result["data"]["suggestions"]
             
             for i, suggestion in enumerate(suggestions, 1):
-                print(f"\n💡 Suggestion {i}:")
-                print(f"   Text: {suggestion['text']}")
-                print(f"   Confidence: {suggestion['confidence']}")
-                print(f"   Reasoning: {suggestion['reasoning']}")
-                print("-" * 40)
+                self.emit(f"\n💡 Suggestion {i}:", buf)
+                self.emit(f"   Text: {suggestion['text']}", buf)
+                self.emit(f"   Confidence: {suggestion['confidence']}", buf)
+                self.emit(f"   Reasoning: {suggestion['reasoning']}", buf)
+                self.emit(_SEP40, buf)
             
-            print(f"\n📊 Model: {result.get('model', 'unknown')}")
+            self.emit(f"\n📊 Model: {result.get('model', 'unknown')}", buf)
             
         else:
-            self.print_status("Error occurred during processing:", "error")
-            print(f"   {result.get('error', 'Unknown error')}")
+            self.print_status("Error occurred during processing:", "error", buf)
+            self.emit(f"   {result.get('error', 'Unknown error')}", buf)
         
-        print("="*60)
+        self.emit(_SEP60, buf)
         
         # Privacy guarantee
-        print("\n🔒 PRIVACY GUARANTEE")
-        print("All processing happened locally on your device.")
-        print("No data was transmitted or stored externally.")
+        self.emit("\n🔒 PRIVACY GUARANTEE", buf)
+        self.emit("All processing happened locally on your device.", buf)
+        self.emit("No data was transmitted or stored externally.", buf)
 
 
 def test_cli_formatting():
     """Test CLI formatting and structure."""
-    print("🧪 Testing Clarity CLI Formatting")
-    print("=" * 50)
+    # Collect all output and write it in one call at the end
+    parts: List[str] = []
+    parts.append("🧪 Testing Clarity CLI Formatting")
+    parts.append("=" * 50)
     
     # Create mock inference engine
     engine = MockClarityInference()
     
     # Test header
-    print("\n1. Testing Header:")
-    engine.print_header()
+    parts.append("\n1. Testing Header:")
+    engine.print_header(buf=parts)
     
     # Test status messages
-    print("\n2. Testing Status Messages:")
-    engine.print_status("This is an info message", "info")
-    engine.print_status("This is a success message", "success")
-    engine.print_status("This is a warning message", "warning")
-    engine.print_status("This is an error message", "error")
+    parts.append("\n2. Testing Status Messages:")
+    engine.print_status("This is an info message", "info", buf=parts)
+    engine.print_status("This is a success message", "success", buf=parts)
+    engine.print_status("This is a warning message", "warning", buf=parts)
+    engine.print_status("This is an error message", "error", buf=parts)
     
     # Test system requirements
-    print("\n3. Testing System Requirements:")
-    engine.check_system_requirements()
+    parts.append("\n3. Testing System Requirements:")
+    engine.check_system_requirements(buf=parts)
     
     # Test model verification
-    print("\n4. Testing Model Verification:")
-    engine.verify_model_integrity()
+    parts.append("\n4. Testing Model Verification:")
+    engine.verify_model_integrity(buf=parts)
     
     # Test structured output
-    print("\n5. Testing Structured Output:")
+    parts.append("\n5. Testing Structured Output:")
     mock_result = {
         "success": True,
         "data": {
@@ -125,9 +148,11 @@ def test_cli_formatting():
         },
         "model": "gemma-3n-e2b-it"
     }
-    engine.display_structured_output(mock_result)
+    engine.display_structured_output(mock_result, buf=parts)
+    
+    parts.append("\n✅ CLI formatting test completed successfully!")
     
-    print("\n✅ CLI formatting test completed successfully!")
+    sys.stdout.write("\n".join(parts) + "\n")
 
 
 if __name__ == "__main__":
@@ -9,181 +9,137 @@ Usage:
     python scripts/tests/validate_output.py
 """
 
+import io
 import json
 import sys
+import types
 import unittest
 from pathlib import Path
-from typing import Dict, List, Any
+from unittest import mock
 
-# Add parent directory to path for imports
-sys.path.append(str(Path(__file__).parent.parent.parent))
+# Add the repository root to the path for imports, once
+_ROOT = str(Path(__file__).resolve().parent.parent.parent)
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
 
-# Mock the inference module for testing without dependencies
-class MockClarityInference:
-    """Mock inference class for testing without dependencies."""
-    
-    def __init__(self):
-        self.chat_prompt_template = """<start_of_turn>user
-{user_input}
+from inference import REQUIRED_FIELD_SET, ClarityInference, Colors
 
-Respond ONLY in the following JSON format with 1-3 suggestions:
-{{
-  "suggestions": [
-    {{
-      "text": "<actionable suggestion>",
-      "confidence": "<low|medium|high|number|percentage>",
-      "reasoning": "<short explanation for this suggestion>"
-    }}
-  ]
-}}
+# Valid JSON responses for testing
+_VALID_RESPONSES = (
+    {
+        "suggestions": [
+            {
+                "text": "Try taking a deep breath and counting to three before speaking.",
+                "confidence": "medium",
+                "reasoning": "Deep breathing can help calm anxiety and give you time to organize your thoughts."
+            },
+            {
+                "text": "Consider writing down key points before your conversation.",
+                "confidence": "high",
+                "reasoning": "Preparation can reduce anxiety and improve communication clarity."
+            }
+        ]
+    },
+    {
+        "suggestions": [
+            {
+                "text": "The word you're looking for might be 'excited' or 'thrilled'.",
+                "confidence": "85%",
+                "reasoning": "These words commonly describe the feeling of being happy and excited about something."
+            }
+        ]
+    }
+)
 
-Do not include any other text, markdown, or formatting. Only valid JSON.
-<end_of_turn>
-<start_of_turn>model
-"""
-        
-        self.stt_prompt_template = """<start_of_turn>user
-Transcribe the following audio recording accurately and provide cognitive support suggestions.
+# Invalid JSON responses for testing
+_INVALID_RESPONSES = (
+    "This is just a plain text response",
+    '{"suggestions": "not an array"}',
+    '{"suggestions": [{"text": "missing fields"}]}',
+    '{"suggestions": [{"text": "test", "confidence": "high"}]}',  # missing reasoning
+    '{"suggestions": [{"text": 123, "confidence": "high", "reasoning": "test"}]}',  # wrong type
+)
 
-Respond ONLY in the following JSON format:
-{{
-  "suggestions": [
-    {{
-      "text": "<transcription and actionable suggestion>",
-      "confidence": "<low|medium|high|number|percentage>",
-      "reasoning": "<short explanation for this suggestion>"
-    }}
-  ]
-}}
+# Confidence values and the Colors attribute they should display in
+_CONFIDENCE_COLORS = (
+    ("high", "GREEN"),
+    ("85%", "GREEN"),
+    ("0.85", "GREEN"),
+    ("1", "RED"),
+    ("1 out of 10", "RED"),
+    ("40", "YELLOW"),
+    ("low (20%)", "RED"),
+)
 
-Do not include any other text, markdown, or formatting. Only valid JSON.
-<end_of_turn>
-<start_of_turn>model
-"""
-    
-    def parse_json_response(self, response: str) -> Dict[str, any]:
-        """Parse and validate JSON response from Gemma 3n."""
-        try:
-            # Clean the response - extract JSON from any surrounding text
-            response = response.strip()
-            
-            # Try to find JSON object in the response
-            start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
-                raise ValueError("No JSON object found in response")
-            
-            json_str = response[start_idx:end_idx]
-            parsed = json.loads(json_str)
-            
-            # Validate schema
-            if "suggestions" not in parsed:
-                raise ValueError("Missing 'suggestions' field in response")
-            
-            if not isinstance(parsed["suggestions"], list):
-                raise ValueError("'suggestions' must be an array")
-            
-            # Check for empty suggestions
-            if len(parsed["suggestions"]) == 0:
-                raise ValueError("'suggestions' array cannot be empty")
-            
-            # Validate each suggestion
-            for i, suggestion in enumerate(parsed["suggestions"]):
-                if not isinstance(suggestion, dict):
-                    raise ValueError(f"Suggestion {i} must be an object")
-                
-                required_fields = ["text", "confidence", "reasoning"]
-                for field in required_fields:
-                    if field not in suggestion:
-                        raise ValueError(f"Suggestion {i} missing required field: {field}")
-                    
-                    if not isinstance(suggestion[field], str):
-                        raise ValueError(f"Suggestion {i}.{field} must be a string")
-            
-            return parsed
-            
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON response: {e}")
-        except Exception as e:
-            raise ValueError(f"Error parsing response: {e}")
-
-try:
-    from inference import ClarityInference
-except ImportError:
-    print("⚠️  Dependencies not installed, using mock for testing")
-    ClarityInference = MockClarityInference
+# Sample outputs for text and audio processing, as shown in the docs
+_SAMPLE_OUTPUTS = (
+    (
+        "text sample",
+        {
+            "suggestions": [
+                {
+                    "text": "Try describing the object or concept using its features.",
+                    "confidence": "high",
+                    "reasoning": "Semantic feature analysis is an effective word-finding strategy."
+                },
+                {
+                    "text": "Take a moment to breathe and relax - stress can make word-finding harder.",
+                    "confidence": "medium",
+                    "reasoning": "Anxiety can interfere with language retrieval processes."
+                }
+            ]
+        }
+    ),
+    (
+        "audio sample",
+        {
+            "suggestions": [
+                {
+                    "text": "I heard you say 'I need help with communication'. Try using 'I' statements to express your needs clearly.",
+                    "confidence": "medium",
+                    "reasoning": "Transcription appears clear but context may vary. 'I' statements are generally helpful for communication."
+                }
+            ]
+        }
+    ),
+)
 
 
 class TestStructuredOutput(unittest.TestCase):
     """Test cases for structured JSON output validation."""
     
-    def setUp(self):
-        """Set up test fixtures."""
-        self.inference = ClarityInference()
+    @classmethod
+    def setUpClass(cls):
+        """Set up shared test fixtures once; the tests only read from the engine."""
+        cls.inference = ClarityInference()
         
-        # Valid JSON responses for testing
-        self.valid_responses = [
-            {
-                "suggestions": [
-                    {
-                        "text": "Try taking a deep breath and counting to three before speaking.",
-                        "confidence": "medium",
-                        "reasoning": "Deep breathing can help calm anxiety and give you time to organize your thoughts."
-                    },
-                    {
-                        "text": "Consider writing down key points before your conversation.",
-                        "confidence": "high",
-                        "reasoning": "Preparation can reduce anxiety and improve communication clarity."
-                    }
-                ]
-            },
-            {
-                "suggestions": [
-                    {
-                        "text": "The word you're looking for might be 'excited' or 'thrilled'.",
-                        "confidence": "85%",
-                        "reasoning": "These words commonly describe the feeling of being happy and excited about something."
-                    }
-                ]
-            }
-        ]
-        
-        # Invalid JSON responses for testing
-        self.invalid_responses = [
-            "This is just a plain text response",
-            '{"suggestions": "not an array"}',
-            '{"suggestions": [{"text": "missing fields"}]}',
-            '{"suggestions": [{"text": "test", "confidence": "high"}]}',  # missing reasoning
-            '{"suggestions": [{"text": 123, "confidence": "high", "reasoning": "test"}]}',  # wrong type
-        ]
+        # Serialize the valid samples once rather than inside every test loop
+        cls.valid_response_strs = tuple(json.dumps(response) for response in _VALID_RESPONSES)
     
     def test_valid_json_parsing(self):
         """Test that valid JSON responses are parsed correctly."""
-        for i, response in enumerate(self.valid_responses):
-            with self.subTest(i=i):
-                # Convert to string for testing
-                response_str = json.dumps(response)
-                parsed = self.inference.parse_json_response(response_str)
-                
-                self.assertIsInstance(parsed, dict)
-                self.assertIn("suggestions", parsed)
-                self.assertIsInstance(parsed["suggestions"], list)
+        for i, response_str in enumerate(self.valid_response_strs):
+            case = f"case {i}"
+            parsed = self.inference.parse_json_response(response_str)
+            
+            self.assertIsInstance(parsed, dict, msg=case)
+            self.assertIn("suggestions", parsed, msg=case)
+            self.assertIsInstance(parsed["suggestions"], list, msg=case)
+            
+            for suggestion in parsed["suggestions"]:
+                self.assertIsInstance(suggestion, dict, msg=case)
+                self.assertIn("text", suggestion, msg=case)
+                self.assertIn("confidence", suggestion, msg=case)
+                self.assertIn("reasoning", suggestion, msg=case)
                 
-                for suggestion in parsed["suggestions"]:
-                    self.assertIsInstance(suggestion, dict)
-                    self.assertIn("text", suggestion)
-                    self.assertIn("confidence", suggestion)
-                    self.assertIn("reasoning", suggestion)
-                    
-                    # Check field types
-                    self.assertIsInstance(suggestion["text"], str)
-                    self.assertIsInstance(suggestion["confidence"], str)
-                    self.assertIsInstance(suggestion["reasoning"], str)
+                # Check field types
+                self.assertIsInstance(suggestion["text"], str, msg=case)
+                self.assertIsInstance(suggestion["confidence"], str, msg=case)
+                self.assertIsInstance(suggestion["reasoning"], str, msg=case)
     
     def test_invalid_json_handling(self):
         """Test that invalid JSON responses are handled gracefully."""
-        for i, response in enumerate(self.invalid_responses):
+        for i, response in enumerate(_INVALID_RESPONSES):
             with self.subTest(i=i):
                 with self.assertRaises(ValueError):
                     self.inference.parse_json_response(response)
@@ -224,6 +180,12 @@ class TestStructuredOutput(unittest.TestCase):
             self.assertIn("suggestions", parsed)
             self.assertIn("confidence", parsed["suggestions"][0])
     
+    def test_confidence_colors(self):
+        """Test that numeric and labelled confidence values map to the right display color."""
+        for confidence, color in _CONFIDENCE_COLORS:
+            with self.subTest(confidence=confidence):
+                self.assertEqual(self.inference.get_confidence_color(confidence), getattr(Colors, color))
+    
     def test_schema_validation(self):
         """Test that the schema validation catches missing fields."""
         incomplete_responses = [
@@ -275,53 +237,46 @@ class TestStructuredOutput(unittest.TestCase):
 class TestSampleOutputs(unittest.TestCase):
     """Test cases for sample outputs and examples."""
     
-    def test_sample_text_output(self):
-        """Test sample text processing output."""
-        sample_text = "I'm having trouble finding the right word"
-        expected_structure = {
-            "suggestions": [
-                {
-                    "text": "Try describing the object or concept using its features.",
-                    "confidence": "high",
-                    "reasoning": "Semantic feature analysis is an effective word-finding strategy."
-                },
-                {
-                    "text": "Take a moment to breathe and relax - stress can make word-finding harder.",
-                    "confidence": "medium",
-                    "reasoning": "Anxiety can interfere with language retrieval processes."
-                }
-            ]
-        }
+    def test_sample_outputs(self):
+        """Test that the documented text and audio sample outputs follow the schema."""
+        for name, sample in _SAMPLE_OUTPUTS:
+            self.assertIn("suggestions", sample, msg=name)
+            self.assertIsInstance(sample["suggestions"], list, msg=name)
+            
+            for suggestion in sample["suggestions"]:
+                missing = REQUIRED_FIELD_SET - suggestion.keys()
+                self.assertFalse(missing, msg=f"{name} missing fields: {sorted(missing)}")
+
+
+class TestJsonLogitsProcessor(unittest.TestCase):
+    """Test cases for grammar-constrained decoding across generate() calls."""
+    
+    def test_processor_per_call(self):
+        """Test that every generate() call gets a fresh logits processor over the same compiled guide."""
+        inference = ClarityInference()
+        guide = object()
         
-        # Validate the expected structure
-        self.assertIn("suggestions", expected_structure)
-        self.assertIsInstance(expected_structure["suggestions"], list)
+        def compile_json_guide():
+            inference.guide_tokenizer = object()
+            inference.json_guide = guide
         
-        for suggestion in expected_structure["suggestions"]:
-            self.assertIn("text", suggestion)
-            self.assertIn("confidence", suggestion)
-            self.assertIn("reasoning", suggestion)
-    
-    def test_sample_audio_output(self):
-        """Test sample audio processing output."""
-        sample_audio_output = {
-            "suggestions": [
-                {
-                    "text": "I heard you say 'I need help with communication'. Try using 'I' statements to express your needs clearly.",
-                    "confidence": "medium",
-                    "reasoning": "Transcription appears clear but context may vary. 'I' statements are generally helpful for communication."
-                }
-            ]
-        }
+        # Stand-in for outlines so the test runs without it or the gated Gemma tokenizer
+        outlines = types.ModuleType("outlines")
+        outlines.processors = types.ModuleType("outlines.processors")
+        outlines.processors.GuideLogitsProcessor = lambda tokenizer, guide: types.SimpleNamespace(
+            tokenizer=tokenizer, guide=guide
+        )
         
-        # Validate the expected structure
-        self.assertIn("suggestions", sample_audio_output)
-        self.assertIsInstance(sample_audio_output["suggestions"], list)
+        with mock.patch.object(inference, "compile_json_guide", compile_json_guide), \
+                mock.patch.dict(sys.modules, {"outlines": outlines, "outlines.processors": outlines.processors}):
+            inference.compile_json_guide()
+            first = inference.get_json_logits_processor()
+            second = inference.get_json_logits_processor()
         
-        for suggestion in sample_audio_output["suggestions"]:
-            self.assertIn("text", suggestion)
-            self.assertIn("confidence", suggestion)
-            self.assertIn("reasoning", suggestion)
+        self.assertIsNot(first, second)
+        self.assertIs(first.guide, guide)
+        self.assertIs(second.guide, guide)
+        self.assertIs(first.tokenizer, second.tokenizer)
 
 
 def run_validation_tests():
@@ -336,9 +291,10 @@ def run_validation_tests():
     # Add test cases
     suite.addTests(loader.loadTestsFromTestCase(TestStructuredOutput))
     suite.addTests(loader.loadTestsFromTestCase(TestSampleOutputs))
+    suite.addTests(loader.loadTestsFromTestCase(TestJsonLogitsProcessor))
     
-    # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
+    # Run tests quietly; the summary below reports counts and any failure tracebacks
+    runner = unittest.TextTestRunner(verbosity=0, stream=io.StringIO())
     result = runner.run(suite)
     
     # Print summary
@@ -348,6 +304,7 @@ def run_validation_tests():
     print(f"Tests run: {result.testsRun}")
     print(f"Failures: {len(result.failures)}")
     print(f"Errors: {len(result.errors)}")
+    print(f"Skipped: {len(result.skipped)}")
     
     if result.failures:
         print("\n❌ FAILURES:")